@@ -16,6 +16,34 @@ inline double get_time_ms() {
     return duration_cast<microseconds>(high_resolution_clock::now().time_since_epoch()).count() / 1000.0;
 }
 
+// Wrap n borrowed, contiguous queue slots in an ndarray of the given shape. The slots are released back
+// to the queue (commit_pop) when the ndarray is garbage-collected.
+inline nb::ndarray<nb::numpy, uint8_t> borrowed_ndarray(shmem::SMQueue& self, const std::byte* data_ptr,
+                                                        std::size_t index, std::size_t n,
+                                                        const std::vector<std::size_t>& shape) {
+    // Create a small helper object that will release the slots on destruction
+    struct BorrowHandle {
+        shmem::SMQueue* q;
+        std::size_t idx;
+        std::size_t n;
+    };
+
+    auto* handle = new BorrowHandle{&self, index, n};
+
+    // Capsule deleter releases the slots and deletes the handle
+    nb::capsule cap(handle, [](void* p) noexcept {
+        auto* h = static_cast<BorrowHandle*>(p);
+        if (h && h->q) {
+            h->q->commit_pop(h->idx, h->n);
+        }
+        delete h;
+    });
+
+    return nb::ndarray<nb::numpy, uint8_t>(const_cast<uint8_t*>(reinterpret_cast<const uint8_t*>(data_ptr)),
+                                           shape.size(), shape.data(), cap, nullptr, nb::dtype<uint8_t>(),
+                                           nb::device::cpu::value);
+}
+
 NB_MODULE(cyshmem, m) {
     // Module docstring
     m.doc() = "Python bindings for shmem library - a shared memory queue implementation";
@@ -30,6 +58,12 @@ NB_MODULE(cyshmem, m) {
         .def("max_elements", &shmem::SMQueue::max_elements, "Get maximum number of elements")
         .def("element_size", &shmem::SMQueue::element_size, "Get element size in bytes")
         .def("name", &shmem::SMQueue::name, "Get queue name")
+        .def("prefault", &shmem::SMQueue::prefault,
+             "Fault in all message slot pages up front; call on a freshly created queue",
+             nb::call_guard<nb::gil_scoped_release>())
+        .def("lock_memory", &shmem::SMQueue::lock_memory,
+             "Lock the queue's shared memory into RAM (mlock); returns False if the memlock limit forbids it",
+             nb::call_guard<nb::gil_scoped_release>())
         // Custom implementation for push that accepts generic arrays
         .def(
             "push",
@@ -43,7 +77,24 @@ NB_MODULE(cyshmem, m) {
 
                 return result;
             },
-            "Push a message to the queue as an array", nb::arg("array"))
+            "Push a message to the queue as an array", nb::arg("array"), nb::call_guard<nb::gil_scoped_release>())
+        // Push a header + payload message. The 64-byte header (counter, timestamp_ns) is written into the
+        // slot by C++, so the caller never formats it and only needs a payload-sized array.
+        .def(
+            "push_with_header",
+            [](shmem::SMQueue& self, nb::ndarray<const uint8_t, nb::ndim<1>, nb::c_contig> payload,
+               std::uint64_t counter, std::uint64_t timestamp_ns) {
+                if (self.element_size() < shmem::detail::kHeaderSize or
+                    payload.size() != self.element_size() - shmem::detail::kHeaderSize) {
+                    throw std::runtime_error("Payload size does not match element size minus header size");
+                }
+
+                return self.push_with_header(reinterpret_cast<const std::byte*>(payload.data()), counter,
+                                             timestamp_ns);
+            },
+            "Push a message built from a (counter, timestamp_ns) header and a contiguous 1-D uint8 payload array",
+            nb::arg("payload").noconvert(), nb::arg("counter"), nb::arg("timestamp_ns"),
+            nb::call_guard<nb::gil_scoped_release>())
         // Custom implementation for pop that returns generic arrays or None
         .def(
             "pop_np",
@@ -52,8 +103,12 @@ NB_MODULE(cyshmem, m) {
                 // Allocate memory for the array
                 uint8_t* data = new uint8_t[size];
 
-                // Pop directly into the allocated memory
-                bool success = self.pop(reinterpret_cast<std::byte*>(data));
+                // Pop directly into the allocated memory, letting other Python threads run during the wait and copy
+                bool success;
+                {
+                    nb::gil_scoped_release release;
+                    success = self.pop(reinterpret_cast<std::byte*>(data));
+                }
 
                 if (!success) {
                     // Clean up allocated memory if pop failed
@@ -81,8 +136,12 @@ NB_MODULE(cyshmem, m) {
                 // Allocate memory for the array
                 uint8_t* data = new uint8_t[size];
 
-                // Try to pop directly into the allocated memory
-                bool success = self.try_pop(reinterpret_cast<std::byte*>(data));
+                // Try to pop directly into the allocated memory, letting other Python threads run during the copy
+                bool success;
+                {
+                    nb::gil_scoped_release release;
+                    success = self.try_pop(reinterpret_cast<std::byte*>(data));
+                }
 
                 if (!success) {
                     // Clean up allocated memory if pop failed
@@ -116,38 +175,83 @@ NB_MODULE(cyshmem, m) {
                     return std::nullopt;
                 }
 
-                // Create a small helper object that will release the slot on destruction
-                struct BorrowHandle {
-                    shmem::SMQueue* q;
-                    std::size_t idx;
-                };
-
-                auto* handle = new BorrowHandle{&self, index};
+                return borrowed_ndarray(self, data_ptr, index, 1, {self.element_size()});
+            },
+            "Borrow a message (non-blocking) without copy; slot is released when ndarray is GC-ed")
+        // Zero-copy blocking pop. Like borrow_np, but waits for a message. The publisher cannot overwrite
+        // the slot while the view is alive; drop the view promptly, as a full queue with an outstanding
+        // view makes push drop new messages.
+        .def(
+            "pop_view",
+            [](shmem::SMQueue& self, long timeout_ms) -> std::optional<nb::ndarray<nb::numpy, uint8_t>> {
+                const std::byte* data_ptr = nullptr;
+                std::size_t index = 0;
 
-                // Capsule deleter releases the slot and deletes the handle
-                nb::capsule cap(handle, [](void* p) noexcept {
-                    auto* h = static_cast<BorrowHandle*>(p);
-                    if (h && h->q) {
-                        h->q->commit_pop(h->idx);
-                    }
-                    delete h;
-                });
+                // Only the wait runs without the GIL; building the ndarray needs it
+                bool ok;
+                {
+                    nb::gil_scoped_release release;
+                    ok = self.wait_borrow(&data_ptr, index, timeout_ms);
+                }
+                if (!ok) {
+                    return std::nullopt;
+                }
 
-                std::vector<std::size_t> shape = {self.element_size()};
+                return borrowed_ndarray(self, data_ptr, index, 1, {self.element_size()});
+            },
+            "Pop a message (blocking) as a zero-copy view; the slot is protected from the publisher until "
+            "the view is GC-ed. "
+            "A non-negative timeout_ms bounds the wait (None is returned on timeout)",
+            nb::arg("timeout_ms") = -1)
+        // Zero-copy batch pop. Returns a (n, element_size) view over up to max_n consecutive slots,
+        // taken with a single lock round-trip; all n slots are released together when the view is GC-ed.
+        .def(
+            "pop_batch",
+            [](shmem::SMQueue& self, std::size_t max_n,
+               long timeout_ms) -> std::optional<nb::ndarray<nb::numpy, uint8_t>> {
+                const std::byte* data_ptr = nullptr;
+                std::size_t index = 0;
 
-                auto arr = nb::ndarray<nb::numpy, uint8_t>(const_cast<uint8_t*>(reinterpret_cast<const uint8_t*>(data_ptr)),
-                                                           shape.size(), shape.data(), cap, nullptr,
-                                                           nb::dtype<uint8_t>(), nb::device::cpu::value);
+                // Only the wait runs without the GIL; building the ndarray needs it
+                std::size_t n;
+                {
+                    nb::gil_scoped_release release;
+                    n = self.borrow_batch(&data_ptr, index, max_n, timeout_ms);
+                }
+                if (n == 0) {
+                    return std::nullopt;
+                }
 
-                return arr;
+                return borrowed_ndarray(self, data_ptr, index, n, {n, self.element_size()});
             },
-            "Borrow a message (non-blocking) without copy; slot is released when ndarray is GC-ed")
+            nb::arg("max_n"), nb::arg("timeout_ms") = -1,
+            "Pop up to max_n messages (blocking for the first) as a zero-copy (n, element_size) view; "
+            "the slots are released when the view is GC-ed. Returns None on timeout")
+        .def(
+            "pop_blocking",
+            [](shmem::SMQueue& q, nb::ndarray<uint8_t, nb::ndim<1>, nb::c_contig> dst, long timeout_ms) -> bool {
+                if (dst.size() != q.element_size())
+                    throw std::runtime_error("dst wrong size");
+                return q.pop(reinterpret_cast<std::byte*>(dst.data()), timeout_ms);
+            },
+            nb::arg("dst").noconvert(), nb::arg("timeout_ms") = -1, nb::call_guard<nb::gil_scoped_release>(),
+            "Blocking pop into a pre-allocated contiguous array; sleeps in the kernel until the producer posts a "
+            "message. Returns False if timeout_ms (when non-negative) elapses first")
         .def("try_pop_into",
-             [](shmem::SMQueue &q, nb::ndarray<uint8_t, nb::ndim<1>> dst) -> bool {
+             [](shmem::SMQueue &q, nb::ndarray<uint8_t, nb::ndim<1>, nb::c_contig> dst) -> bool {
                  if (dst.size() != q.element_size())
                      throw std::runtime_error("dst wrong size");
                  return q.try_pop(reinterpret_cast<std::byte*>(dst.data()));
              },
-             nb::arg("dst"),
-             "Non-blocking pop into a pre-allocated array");
+             nb::arg("dst").noconvert(), nb::call_guard<nb::gil_scoped_release>(),
+             "Non-blocking pop into a pre-allocated contiguous array")
+        .def("try_pop_header_into",
+             [](shmem::SMQueue &q, nb::ndarray<uint8_t, nb::ndim<1>, nb::c_contig> dst) -> bool {
+                 if (dst.size() > q.element_size())
+                     throw std::runtime_error("dst larger than element size");
+                 return q.try_pop_header(reinterpret_cast<std::byte*>(dst.data()), dst.size());
+             },
+             nb::arg("dst").noconvert(), nb::call_guard<nb::gil_scoped_release>(),
+             "Non-blocking pop that copies only the first dst.size bytes of the message (e.g. its header) "
+             "into a pre-allocated contiguous array; the rest of the message is discarded");
 }
\ No newline at end of file
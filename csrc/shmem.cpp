@@ -20,8 +20,10 @@ SMQueue SMQueue::create(const std::string& name, std::size_t max_elements, std::
         throw std::runtime_error("Failed to create shared memory: " + name + " (errno: " + std::to_string(errno) + ")");
     }
 
-    // Calculate total size needed (header + data)
-    std::size_t header_size = sizeof(ControlBlock);
+    // Calculate total size needed (header + data). The control block is followed by one borrower pid per
+    // slot, padded so the data region starts on a cache line
+    std::size_t owners_size = (max_elements * sizeof(pid_t) + 63) / 64 * 64;
+    std::size_t header_size = sizeof(ControlBlock) + owners_size;
     std::size_t data_size = max_elements * element_size;
 
     // Check for potential integer overflow in total size calculation
@@ -31,7 +33,8 @@ SMQueue SMQueue::create(const std::string& name, std::size_t max_elements, std::
         throw std::runtime_error("Queue size too large, would cause integer overflow in total size calculation");
     }
 
-    std::size_t total_size = header_size + data_size;
+    // Round up to whole huge pages so the tail of the data region can be huge-page backed too
+    std::size_t total_size = detail::round_to_huge_pages(header_size + data_size);
 
     // Set size
     if (ftruncate(fd, total_size) < 0) {
@@ -48,17 +51,18 @@ SMQueue SMQueue::create(const std::string& name, std::size_t max_elements, std::
         throw std::runtime_error("Failed to map shared memory: " + name);
     }
 
-#ifdef __linux__
     // Hint the kernel to back the mapping with huge pages and pre-populate if possible.
-    madvise(addr, total_size, MADV_HUGEPAGE | MADV_WILLNEED);
-#endif
+    detail::advise_huge_pages(addr, total_size);
 
     // Initialize control block
     ControlBlock* cb = static_cast<ControlBlock*>(addr);
     cb->max_elements = max_elements;
     cb->element_size = element_size;
+    cb->data_offset = header_size;
     cb->head = 0;
     cb->tail = 0;
+    cb->held = 0;
+    std::memset(static_cast<char*>(addr) + sizeof(ControlBlock), 0, owners_size);
     cb->count = 0;
 
     // Create queue and initialize semaphores
@@ -103,6 +107,9 @@ SMQueue SMQueue::open(const std::string& name) {
         throw std::runtime_error("Failed to map shared memory: " + name);
     }
 
+    // Each process has its own mapping, so the huge page hint has to be repeated here
+    detail::advise_huge_pages(addr, static_cast<std::size_t>(st.st_size));
+
     // Create queue and open semaphores
     try {
         SMQueue queue(name, addr, static_cast<std::size_t>(st.st_size));
@@ -196,8 +203,29 @@ SMQueue& SMQueue::operator=(SMQueue&& other) noexcept {
 SMQueue::~SMQueue() noexcept { close(); }
 
 // Push a message to the queue
-// If the queue is full, the oldest message will be dropped to make room
+// If the queue is full, the oldest message will be dropped to make room (or, while a consumer still holds
+// borrowed slots, the new message is dropped instead)
 bool SMQueue::push(const std::byte* data) {
+    return push_slot([data](std::byte* dest, std::size_t size) {
+        // The producer never reads the slot back, so bypass the cache for large messages
+        detail::stream_copy(dest, data, size);
+    });
+}
+
+// Push a header + payload message, writing the header straight into the slot
+bool SMQueue::push_with_header(const std::byte* payload, std::uint64_t counter, std::uint64_t timestamp_ns) {
+    if (m_addr != nullptr and element_size() < detail::kHeaderSize) {
+        throw std::runtime_error("Element size is smaller than the message header");
+    }
+
+    return push_slot([=](std::byte* dest, std::size_t size) {
+        detail::write_header(dest, counter, timestamp_ns);
+        detail::stream_copy(dest + detail::kHeaderSize, payload, size - detail::kHeaderSize);
+    });
+}
+
+// Reserve the head slot, fill it and publish it
+template <typename Fill> bool SMQueue::push_slot(Fill&& fill) {
     if (m_addr == nullptr) {
         throw std::runtime_error("SMQueue not initialized");
     }
@@ -214,9 +242,20 @@ bool SMQueue::push(const std::byte* data) {
         throw std::runtime_error("Failed to lock mutex");
     }
 
-    // Check if queue is full
+    // Check if queue is full; slots still held by a consumer count towards capacity
     bool dropped_message = false;
-    if (cb->count >= cb->max_elements) {
+    if (cb->count + cb->held >= cb->max_elements and cb->held > 0) {
+        // A consumer that exited while holding views can never release them; take its slots back first
+        reclaim_dead_borrowers(cb);
+    }
+    if (cb->count + cb->held >= cb->max_elements) {
+        if (cb->held > 0) {
+            // The slot at head is the oldest held slot, which a borrowed view may still be reading. Never
+            // overwrite it: drop the new message instead and let the consumer catch up.
+            sem_post(m_mutex);
+            return false;
+        }
+
         // Drop the oldest message by advancing the tail
         cb->tail = (cb->tail + 1) % cb->max_elements;
         cb->count--;
@@ -229,7 +268,7 @@ bool SMQueue::push(const std::byte* data) {
     // Get pointer to the element at head position
     std::byte* dest = get_element(cb->head);
 
-    std::memcpy(dest, data, cb->element_size);
+    fill(dest, cb->element_size);
 
     // Advance the head
     cb->head = (cb->head + 1) % cb->max_elements;
@@ -246,7 +285,7 @@ bool SMQueue::push(const std::byte* data) {
 }
 
 // Pop a message from the queue (blocking)
-bool SMQueue::pop(std::byte* buffer) {
+bool SMQueue::pop(std::byte* buffer, long timeout_ms) {
     if (m_addr == nullptr) {
         return false;
     }
@@ -254,16 +293,12 @@ bool SMQueue::pop(std::byte* buffer) {
     auto* cb = get_control_block();
 
     // Wait for an item to be available
-    int result;
-    do {
-        result = sem_wait(m_items);
-    } while (result == -1 and errno == EINTR);
-
-    if (result == -1) {
+    if (!acquire_item(timeout_ms)) {
         return false;
     }
 
     // Lock mutex
+    int result;
     do {
         result = sem_wait(m_mutex);
     } while (result == -1 and errno == EINTR);
@@ -276,11 +311,11 @@ bool SMQueue::pop(std::byte* buffer) {
     // Get pointer to the element at tail position
     const std::byte* src = get_element(cb->tail);
 
-    std::memcpy(buffer, src, cb->element_size);
+    // The slot is recycled right after this copy, so stream it out without caching it
+    detail::stream_copy(buffer, src, cb->element_size, true);
 
     // Advance the tail
-    cb->tail = (cb->tail + 1) % cb->max_elements;
-    cb->count--;
+    consume(cb, 1);
 
     // Unlock the mutex
     sem_post(m_mutex);
@@ -315,12 +350,50 @@ bool SMQueue::try_pop(std::byte* buffer) {
     // Get pointer to the element at tail position
     const std::byte* src = get_element(cb->tail);
 
-    // MacOS memcpy works really well, so we use it
-    std::memcpy(buffer, src, cb->element_size);
+    // The slot is recycled right after this copy, so stream it out without caching it (falls back to
+    // memcpy on targets without AVX, e.g. Apple silicon, where memcpy works really well)
+    detail::stream_copy(buffer, src, cb->element_size, true);
 
     // Advance the tail
-    cb->tail = (cb->tail + 1) % cb->max_elements;
-    cb->count--;
+    consume(cb, 1);
+
+    // Unlock the mutex
+    sem_post(m_mutex);
+    return true;
+}
+
+// Try to pop a message, copying out only its first n bytes (non-blocking)
+bool SMQueue::try_pop_header(std::byte* buffer, std::size_t n) {
+    if (m_addr == nullptr) {
+        return false;
+    }
+
+    auto* cb = get_control_block();
+    if (n > cb->element_size) {
+        throw std::runtime_error("Header size exceeds element size");
+    }
+
+    // Try to get an item (non-blocking)
+    if (sem_trywait(m_items) != 0) {
+        return false;
+    }
+
+    // Lock mutex
+    int result;
+    do {
+        result = sem_wait(m_mutex);
+    } while (result == -1 and errno == EINTR);
+
+    if (result == -1) {
+        sem_post(m_items);
+        return false;
+    }
+
+    // Copy the header only; the rest of the slot is never read and is overwritten by a later push
+    std::memcpy(buffer, get_element(cb->tail), n);
+
+    // Advance the tail
+    consume(cb, 1);
 
     // Unlock the mutex
     sem_post(m_mutex);
@@ -338,6 +411,35 @@ bool SMQueue::borrow(std::byte const** data_ptr, std::size_t& index_out) {
         return false; // queue empty
     }
 
+    return borrow_acquired(data_ptr, index_out);
+}
+
+// Zero-copy borrow (blocking). Returns true if a message was borrowed.
+bool SMQueue::wait_borrow(std::byte const** data_ptr, std::size_t& index_out, long timeout_ms) {
+    if (m_addr == nullptr) {
+        return false;
+    }
+
+    // Wait for an item to be available – same as pop but without copying.
+    if (!acquire_item(timeout_ms)) {
+        return false;
+    }
+
+    return borrow_acquired(data_ptr, index_out);
+}
+
+// Zero-copy borrow of a run of consecutive messages. Returns the number of messages borrowed.
+std::size_t SMQueue::borrow_batch(std::byte const** data_ptr, std::size_t& index_out, std::size_t max_n,
+                                  long timeout_ms) {
+    if (m_addr == nullptr or max_n == 0) {
+        return 0;
+    }
+
+    // Wait for the first item to be available
+    if (!acquire_item(timeout_ms)) {
+        return 0;
+    }
+
     // Lock the mutex to read metadata safely
     int result;
     do {
@@ -347,12 +449,20 @@ bool SMQueue::borrow(std::byte const** data_ptr, std::size_t& index_out) {
     if (result == -1) {
         // Failed to lock – restore semaphore so we don't lose the item
         sem_post(m_items);
-        return false;
+        return 0;
     }
 
     auto* cb = get_control_block();
 
     index_out = cb->tail;
+
+    // Only hand out slots up to the end of the ring so the batch stays contiguous
+    std::size_t limit = std::min(max_n, cb->max_elements - cb->tail);
+    std::size_t n = 1;
+    while (n < limit and sem_trywait(m_items) == 0) {
+        n++;
+    }
+
     const std::byte* src = get_element(cb->tail);
 
 #ifdef __GNUC__
@@ -362,17 +472,15 @@ bool SMQueue::borrow(std::byte const** data_ptr, std::size_t& index_out) {
 
     *data_ptr = src;
 
-    // NOTE: We purposely *do not* advance tail/count here. The slot will be released later via
-    // commit_pop(). This keeps the message reserved so that producers cannot overwrite it while it
-    // is still in use by the consumer.
+    // As with borrow(), the slots stay held until commit_pop() so producers cannot overwrite them
+    consume(cb, n, true);
 
-    // Unlock mutex so producers/other consumers can proceed.
     sem_post(m_mutex);
-    return true;
+    return n;
 }
 
-// Release a previously borrowed slot and make it reusable.
-void SMQueue::commit_pop(std::size_t index) {
+// Release previously borrowed slot(s) and make them reusable.
+void SMQueue::commit_pop(std::size_t index, std::size_t n) {
     if (m_addr == nullptr) {
         return;
     }
@@ -389,16 +497,54 @@ void SMQueue::commit_pop(std::size_t index) {
         return; // failed to lock, leak the slot – worst-case scenario is transient memory pressure
     }
 
-    // Sanity-check index belongs to current tail
-    if (index == cb->tail) {
-        cb->tail = (cb->tail + 1) % cb->max_elements;
-        cb->count--; // item fully consumed
+    if (index < cb->max_elements and n <= cb->max_elements) {
+        // Clear the borrow marks of this run. Borrows may be released in any order; only the slots in front
+        // of the oldest run still borrowed are handed back to the producer
+        pid_t* owners = get_owners();
+        for (std::size_t i = 0; i < n; ++i) {
+            owners[(index + i) % cb->max_elements] = 0;
+        }
+        release_held(cb);
     }
 
     // Unlock mutex
     sem_post(m_mutex);
 }
 
+// Fault in every page of the message slots up front
+void SMQueue::prefault() {
+    if (m_addr == nullptr) {
+        throw std::runtime_error("SMQueue not initialized");
+    }
+
+    std::byte* data = get_data_buffer();
+    std::size_t size = max_elements() * element_size();
+
+#if defined(__linux__) && defined(MADV_POPULATE_WRITE)
+    // Populate writable pages without touching their contents (Linux 5.14+); the slot-sized range
+    // starts right after the control block, so round it out to page boundaries first
+    const auto page = static_cast<std::uintptr_t>(sysconf(_SC_PAGESIZE));
+    auto begin = reinterpret_cast<std::uintptr_t>(data) & ~(page - 1);
+    auto end = reinterpret_cast<std::uintptr_t>(data) + size;
+    if (madvise(reinterpret_cast<void*>(begin), end - begin, MADV_POPULATE_WRITE) == 0) {
+        return;
+    }
+#endif
+    // Fallback: write every slot once. This overwrites queued messages, so only prefault a fresh queue
+    std::memset(data, 0, size);
+}
+
+// Lock the whole mapping into RAM
+bool SMQueue::lock_memory() {
+    if (m_addr == nullptr) {
+        throw std::runtime_error("SMQueue not initialized");
+    }
+
+    // Fails with EPERM/ENOMEM when the mapping exceeds RLIMIT_MEMLOCK and the process lacks CAP_IPC_LOCK;
+    // the lock is dropped automatically when the mapping is unmapped
+    return mlock(m_addr, m_size) == 0;
+}
+
 // Close the queue
 void SMQueue::close() {
     if (m_mutex != nullptr) {
@@ -441,7 +587,12 @@ std::byte* SMQueue::get_data_buffer() const {
     }
 
     // Cast directly to std::byte* to avoid multiple pointer conversions
-    return reinterpret_cast<std::byte*>(static_cast<char*>(m_addr) + sizeof(ControlBlock));
+    return reinterpret_cast<std::byte*>(static_cast<char*>(m_addr) + get_control_block()->data_offset);
+}
+
+// Get the per-slot borrower pids stored right after the control block
+pid_t* SMQueue::get_owners() const {
+    return reinterpret_cast<pid_t*>(static_cast<char*>(m_addr) + sizeof(ControlBlock));
 }
 
 // Get element at index
@@ -531,4 +682,147 @@ void SMQueue::open_semaphores() {
     }
 }
 
+// Acquire an item from the items semaphore, waiting up to timeout_ms (indefinitely if negative)
+bool SMQueue::acquire_item(long timeout_ms) {
+    if (timeout_ms == 0) {
+        return sem_trywait(m_items) == 0;
+    }
+
+    int result;
+    if (timeout_ms < 0) {
+        do {
+            result = sem_wait(m_items);
+        } while (result == -1 and errno == EINTR);
+        return result == 0;
+    }
+
+#ifdef __linux__
+#if defined(__GLIBC__) and (__GLIBC__ > 2 or (__GLIBC__ == 2 and __GLIBC_MINOR__ >= 30))
+    // sem_clockwait (glibc 2.30+) measures the deadline on CLOCK_MONOTONIC, so a wall-clock step cannot
+    // stretch or cut short the wait
+    constexpr clockid_t clock = CLOCK_MONOTONIC;
+#else
+    // Older libcs only have sem_timedwait, which takes an absolute CLOCK_REALTIME deadline
+    constexpr clockid_t clock = CLOCK_REALTIME;
+#endif
+    struct timespec deadline;
+    clock_gettime(clock, &deadline);
+    deadline.tv_sec += timeout_ms / 1000;
+    deadline.tv_nsec += (timeout_ms % 1000) * 1000000L;
+    if (deadline.tv_nsec >= 1000000000L) {
+        deadline.tv_sec += 1;
+        deadline.tv_nsec -= 1000000000L;
+    }
+
+    do {
+#if defined(__GLIBC__) and (__GLIBC__ > 2 or (__GLIBC__ == 2 and __GLIBC_MINOR__ >= 30))
+        result = sem_clockwait(m_items, clock, &deadline);
+#else
+        result = sem_timedwait(m_items, &deadline);
+#endif
+    } while (result == -1 and errno == EINTR);
+    return result == 0;
+#else
+    // macOS has no sem_timedwait, so poll with a short sleep until the deadline
+    auto deadline = std::chrono::steady_clock::now() + std::chrono::milliseconds(timeout_ms);
+    while (sem_trywait(m_items) != 0) {
+        if (std::chrono::steady_clock::now() >= deadline) {
+            return false;
+        }
+        std::this_thread::sleep_for(std::chrono::microseconds(50));
+    }
+    return true;
+#endif
+}
+
+// Consume n messages at the tail. Borrowed slots are marked with the borrower's pid and start or extend the
+// held span; copied slots only extend a span that is already open, so held always covers the run from the
+// oldest still-borrowed slot up to the tail.
+void SMQueue::consume(ControlBlock* cb, std::size_t n, bool borrow) {
+    if (borrow) {
+        pid_t* owners = get_owners();
+        pid_t pid = getpid();
+        for (std::size_t i = 0; i < n; ++i) {
+            owners[(cb->tail + i) % cb->max_elements] = pid;
+        }
+    }
+
+    cb->tail = (cb->tail + n) % cb->max_elements;
+    cb->count -= n;
+    if (borrow or cb->held > 0) {
+        cb->held += n;
+    }
+}
+
+// Clear the borrow marks of slots whose borrowing process no longer exists, then release them
+void SMQueue::reclaim_dead_borrowers(ControlBlock* cb) {
+    pid_t* owners = get_owners();
+    std::size_t oldest = (cb->tail + cb->max_elements - cb->held) % cb->max_elements;
+
+    // A batch marks many slots with the same pid, so remember the last answer
+    pid_t last_pid = 0;
+    bool last_dead = false;
+    for (std::size_t i = 0; i < cb->held; ++i) {
+        pid_t& owner = owners[(oldest + i) % cb->max_elements];
+        if (owner == 0) {
+            continue;
+        }
+        if (owner != last_pid) {
+            last_pid = owner;
+            // EPERM means the process exists but belongs to another user, so only ESRCH counts as dead
+            last_dead = kill(owner, 0) == -1 and errno == ESRCH;
+        }
+        if (last_dead) {
+            owner = 0;
+        }
+    }
+
+    release_held(cb);
+}
+
+// Shrink the held span past its leading slots that are no longer borrowed
+void SMQueue::release_held(ControlBlock* cb) {
+    const pid_t* owners = get_owners();
+    std::size_t oldest = (cb->tail + cb->max_elements - cb->held) % cb->max_elements;
+    while (cb->held > 0 and owners[oldest] == 0) {
+        oldest = (oldest + 1) % cb->max_elements;
+        cb->held--;
+    }
+}
+
+// Borrow the element at the tail; the caller has already acquired an item from m_items.
+bool SMQueue::borrow_acquired(std::byte const** data_ptr, std::size_t& index_out) {
+    // Lock the mutex to read metadata safely
+    int result;
+    do {
+        result = sem_wait(m_mutex);
+    } while (result == -1 && errno == EINTR);
+
+    if (result == -1) {
+        // Failed to lock – restore semaphore so we don't lose the item
+        sem_post(m_items);
+        return false;
+    }
+
+    auto* cb = get_control_block();
+
+    index_out = cb->tail;
+    const std::byte* src = get_element(cb->tail);
+
+#ifdef __GNUC__
+    // Prefetch first cache line to hide latency
+    __builtin_prefetch(src, 0, 3);
+#endif
+
+    *data_ptr = src;
+
+    // The message is consumed now, but its slot stays held until commit_pop(), so producers cannot
+    // overwrite it while it is still in use by the consumer.
+    consume(cb, 1, true);
+
+    // Unlock mutex so producers/other consumers can proceed.
+    sem_post(m_mutex);
+    return true;
+}
+
 } // namespace shmem
\ No newline at end of file
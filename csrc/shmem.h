@@ -2,17 +2,27 @@
 
 #include <fcntl.h>     // for O_CREAT, O_RDWR
 #include <semaphore.h> // for sem_t, sem_open
+#include <signal.h>    // for kill
 #include <sys/mman.h>  // for shm_open, mmap
 #include <sys/stat.h>  // for fstat
 #include <unistd.h>    // for close, ftruncate
 
+#if defined(__AVX__) || defined(__AVX512F__)
+#include <immintrin.h> // for _mm256_stream_si256, _mm512_storeu_si512, _mm_sfence
+#endif
+
+#include <algorithm> // for std::min
 #include <cassert>   // for assert
 #include <cerrno>    // for errno
+#include <chrono>    // for std::chrono::steady_clock
 #include <cstddef>   // for std::byte
+#include <cstdint>   // for std::uint64_t, std::uintptr_t
 #include <cstring>   // for memcpy, strncpy
+#include <ctime>     // for clock_gettime
 #include <limits>    // for std::numeric_limits
 #include <stdexcept> // for std::runtime_error
 #include <string>    // for std::string
+#include <thread>    // for std::this_thread::sleep_for
 
 namespace shmem {
 
@@ -30,12 +40,96 @@ namespace shmem {
 
 // Helper functions
 namespace detail {
+// Huge page size used to round up and advise large mappings (2MB on x86-64 and arm64 Linux)
+constexpr std::size_t kHugePageSize = 2 * 1024 * 1024;
+
 // Close a file descriptor safely
 inline void safe_close(int fd) {
     if (fd >= 0) {
         close(fd);
     }
 }
+
+// Round a mapping size up to a whole number of huge pages once it spans at least one
+inline std::size_t round_to_huge_pages(std::size_t size) {
+    if (size < kHugePageSize) {
+        return size;
+    }
+    return (size + kHugePageSize - 1) / kHugePageSize * kHugePageSize;
+}
+
+// Ask the kernel to back a shared mapping with transparent huge pages. MAP_HUGETLB cannot be used
+// for shm_open() mappings (they live on tmpfs, not hugetlbfs), so this relies on THP for shmem
+// (/sys/kernel/mm/transparent_hugepage/shmem_enabled set to "advise" or "always").
+inline void advise_huge_pages(void* addr, std::size_t size) {
+#ifdef __linux__
+    // madvise() advice values are not bit flags, so each hint is a separate call
+    madvise(addr, size, MADV_HUGEPAGE);
+    madvise(addr, size, MADV_WILLNEED);
+#else
+    (void)addr;
+    (void)size;
+#endif
+}
+
+// Size of the message header written by SMQueue::push_with_header (one cache line)
+constexpr std::size_t kHeaderSize = 64;
+
+// Write a header of (counter, timestamp_ns) followed by zero padding to one cache line. With AVX-512 the
+// whole line is written by a single 64-byte store.
+inline void write_header(std::byte* dst, std::uint64_t counter, std::uint64_t timestamp_ns) {
+#if defined(__AVX512F__)
+    __m512i line = _mm512_set_epi64(0, 0, 0, 0, 0, 0, static_cast<long long>(timestamp_ns),
+                                    static_cast<long long>(counter));
+    _mm512_storeu_si512(dst, line);
+#else
+    std::uint64_t line[kHeaderSize / sizeof(std::uint64_t)] = {counter, timestamp_ns};
+    std::memcpy(dst, line, kHeaderSize);
+#endif
+}
+
+// Copies at least this large bypass the cache
+constexpr std::size_t kStreamCopyThreshold = 256 * 1024;
+
+// How far ahead of the copy position source lines are prefetched when prefetch_src is set
+constexpr std::size_t kPrefetchDistance = 512;
+
+// Copy into memory that the writer will not read again (e.g. a queue slot handed to another process).
+// Large copies use non-temporal stores so the destination lines are not read into the cache first
+// (no write-allocate); small copies and targets without AVX fall back to memcpy.
+// With prefetch_src the source is read through prefetchnta as well, for sources that will not be read
+// again either (a slot being popped). Shared memory is ordinary write-back memory, where streaming loads
+// (vmovntdqa) behave like plain loads, so the non-temporal prefetch is what keeps it out of L2.
+inline void stream_copy(std::byte* dst, const std::byte* src, std::size_t n, bool prefetch_src = false) {
+#if defined(__AVX__)
+    if (n >= kStreamCopyThreshold) {
+        // Copy the unaligned head so the streaming stores hit 32-byte aligned addresses
+        std::size_t head = (32 - (reinterpret_cast<std::uintptr_t>(dst) & 31)) & 31;
+        std::memcpy(dst, src, head);
+        dst += head;
+        src += head;
+        n -= head;
+
+        std::size_t blocks = n / 32;
+        for (std::size_t i = 0; i < blocks; ++i) {
+            if (prefetch_src and (i & 1) == 0) {
+                // One prefetch per 64-byte line; prefetching past the end of src is harmless
+                _mm_prefetch(reinterpret_cast<const char*>(src) + i * 32 + kPrefetchDistance, _MM_HINT_NTA);
+            }
+            __m256i v = _mm256_loadu_si256(reinterpret_cast<const __m256i*>(src) + i);
+            _mm256_stream_si256(reinterpret_cast<__m256i*>(dst) + i, v);
+        }
+
+        // Copy the remaining tail and make the streaming stores visible before the slot changes hands
+        std::memcpy(dst + blocks * 32, src + blocks * 32, n - blocks * 32);
+        _mm_sfence();
+        return;
+    }
+#else
+    (void)prefetch_src; // Only the streaming path prefetches
+#endif
+    std::memcpy(dst, src, n);
+}
 } // namespace detail
 
 // Forward declarations
@@ -60,24 +154,62 @@ class SMQueue {
     ~SMQueue() noexcept;
 
     // Push a message to the queue
-    // If the queue is full, the oldest message will be dropped to make room
+    // If the queue is full, the oldest message will be dropped to make room. Slots borrowed by a consumer are
+    // never dropped or overwritten: if the queue is full while borrows are outstanding, the new message is
+    // dropped instead.
     // Returns true if no messages were dropped, false if some were dropped
     bool push(const std::byte* data);
 
+    // Push a message made of a kHeaderSize-byte header holding (counter, timestamp_ns) and a payload of
+    // element_size() - kHeaderSize bytes, without assembling the message in a separate buffer first
+    // Returns true if no messages were dropped, false if some were dropped
+    bool push_with_header(const std::byte* payload, std::uint64_t counter, std::uint64_t timestamp_ns);
+
     // Pop a message from the queue (blocking)
-    // Returns true if successful, false if an error occurred
-    bool pop(std::byte* buffer);
+    // timeout_ms < 0 waits indefinitely; otherwise the wait is bounded to timeout_ms milliseconds
+    // Returns true if successful, false on timeout or if an error occurred
+    bool pop(std::byte* buffer, long timeout_ms = -1);
 
     // Try to pop a message (non-blocking)
     bool try_pop(std::byte* buffer);
 
+    // Try to pop a message (non-blocking), copying only its first n bytes into buffer. The message is
+    // consumed as a whole; use this when only the header is needed and the payload can be skipped.
+    bool try_pop_header(std::byte* buffer, std::size_t n);
+
     // Zero-copy borrow of the next message (non-blocking). Returns true on success. The caller receives
     // a pointer to the message data living inside the queue and the element index that must later be
-    // released via commit_pop(index).
+    // released via commit_pop(index). The message is consumed immediately; until it is released, push
+    // will not drop or overwrite its slot. Slots are marked with the borrower's pid, so if the borrowing
+    // process exits without releasing them, a push into the full queue reclaims them. The borrower must
+    // share the producer's pid namespace for this.
     bool borrow(std::byte const** data_ptr, std::size_t& index);
 
-    // Release a previously borrowed element (identified by its index) and make the slot reusable.
-    void commit_pop(std::size_t index);
+    // Zero-copy borrow of the next message (blocking). Same contract as borrow(), but waits for a
+    // message to become available (bounded by timeout_ms when it is non-negative).
+    bool wait_borrow(std::byte const** data_ptr, std::size_t& index, long timeout_ms = -1);
+
+    // Zero-copy borrow of up to max_n consecutive messages with a single lock round-trip. Waits for the
+    // first message like wait_borrow() (timeout_ms == 0 polls once) and then takes whatever else is
+    // already queued, without wrapping around the end of the ring. Returns the number of messages
+    // borrowed (0 if none); they are contiguous in memory starting at *data_ptr and must be released
+    // together via commit_pop(index, n).
+    std::size_t borrow_batch(std::byte const** data_ptr, std::size_t& index, std::size_t max_n,
+                             long timeout_ms = 0);
+
+    // Release n previously borrowed element(s) starting at index. Borrows may be released in any order; a
+    // slot becomes reusable by push once it and every slot borrowed before it have been released.
+    void commit_pop(std::size_t index, std::size_t n = 1);
+
+    // Fault in all message slot pages so the first pushes and pops do not pay a page fault per 4KB page.
+    // Call it on a freshly created queue: where the kernel cannot populate pages in place, the slots are
+    // zeroed instead.
+    void prefault();
+
+    // Lock the queue's mapping (control block and slots) into RAM, so its pages are never swapped out or
+    // reclaimed and a later access cannot take a major fault. Returns false if the kernel refuses, typically
+    // because the mapping exceeds RLIMIT_MEMLOCK. The mapping is already advised to use huge pages.
+    bool lock_memory();
 
     // Close the queue
     void close();
@@ -92,15 +224,20 @@ class SMQueue {
     const std::string& name() const;
 
   private:
-    // Control block structure
+    // Control block structure. Fields written on every push or pop each get their own cache line, so a
+    // producer write does not invalidate the consumer's copy of the other index or of the read-only
+    // configuration (element_size is read on every operation).
     struct alignas(64) ControlBlock {
         std::size_t max_elements; // Maximum number of elements
         std::size_t element_size; // Size of each element in bytes
-        std::size_t head;         // Write position (element index)
-        std::size_t tail;         // Read position (element index)
-        std::size_t count;        // Number of elements in the queue
+        std::size_t data_offset;  // Offset of the first slot from the start of the mapping
         char mutex_name[128];     // Mutex semaphore name
         char items_name[128];     // Items semaphore name
+
+        alignas(64) std::size_t head;  // Write position (element index), written by the producer
+        alignas(64) std::size_t tail;  // Read position (element index), written by the consumer
+        std::size_t held;              // Slots from the oldest still-borrowed one up to tail; push must not reuse them
+        alignas(64) std::size_t count; // Number of elements in the queue, written by both
     };
 
     // Constructor
@@ -124,6 +261,30 @@ class SMQueue {
     // Open existing semaphores
     void open_semaphores();
 
+    // Reserve the slot at head (dropping the oldest message if the queue is full), let fill(dest, size)
+    // write the message into it and publish it. Returns true if no messages were dropped.
+    template <typename Fill> bool push_slot(Fill&& fill);
+
+    // Acquire an item from the items semaphore. The waiting thread sleeps in the kernel and is woken
+    // by the producer's sem_post. timeout_ms < 0 waits indefinitely, 0 polls once.
+    bool acquire_item(long timeout_ms);
+
+    // Get the borrower pid of each slot (0 if the slot is not borrowed), stored after the control block
+    pid_t* get_owners() const;
+
+    // Advance the tail past n consumed messages (with the mutex held). Borrowed messages (borrow == true)
+    // keep their slots held until commit_pop(); other consumed slots stay held while an older borrow is out.
+    void consume(ControlBlock* cb, std::size_t n, bool borrow = false);
+
+    // Drop slots that are no longer borrowed from the front of the held span, handing them back to push
+    void release_held(ControlBlock* cb);
+
+    // Release slots still marked as borrowed by processes that have exited (e.g. a killed consumer)
+    void reclaim_dead_borrowers(ControlBlock* cb);
+
+    // Borrow the element at the tail once an item has been acquired from the items semaphore
+    bool borrow_acquired(std::byte const** data_ptr, std::size_t& index);
+
     // Member variables
     std::string m_name; // Queue name
     void* m_addr;       // Mapped memory address
@@ -16,9 +16,9 @@ from shmem import SMQueue
 
 # Constants
 QUEUE_NAME = "/my_queue_example_2"
-MESSAGE_SIZE = int(0.5 * 1024 * 1024)  # 10MB message size
+MESSAGE_SIZE = int(0.5 * 1024 * 1024)  # 0.5MB message size
 MAX_ELEMENTS = 100  # Maximum number of elements in the queue
-HEADER_SIZE = 64  # Reduced header size
+HEADER_SIZE = 64  # Header size; written by SMQueue.push_with_header as (counter, timestamp_ns)
 
 # Global variables
 running = True
@@ -76,36 +76,27 @@ def main() -> None:
         print(f"Message size: {MESSAGE_SIZE} bytes, Max elements: {MAX_ELEMENTS}")
         print(f"Delay between messages: {args.delay} seconds")
 
-        # Pre-allocate buffer for message and pre-fill with random data
-        message_buffer: NDArray[np.uint8] = np.zeros(MESSAGE_SIZE, dtype=np.uint8)
-
-        # Fill the buffer with random data once (after header)
-        message_buffer[HEADER_SIZE:] = np.random.randint(
+        # Generate the payload only, with random data, once; push_with_header
+        # writes the header into the queue slot itself
+        rng = np.random.default_rng()
+        payload: NDArray[np.uint8] = rng.integers(
             0, 256, size=MESSAGE_SIZE - HEADER_SIZE, dtype=np.uint8
         )
 
         while running:
-            # Get current timestamp in milliseconds (not microseconds)
-            # This is a simpler approach that might help diagnose the issue
-            timestamp = int(time.time() * 1000)  # milliseconds since epoch
-            
-            # Create message header with timestamp and counter
-            header = f"Message #{counter} {timestamp}".encode("utf-8")
-            header_len = len(header)
-            
-            # Copy header to the beginning of the buffer
-            message_buffer[:header_len] = np.frombuffer(header, dtype=np.uint8)
-            
+            # Monotonic timestamp in nanoseconds; CLOCK_MONOTONIC is shared by processes on this host
+            timestamp_ns = time.monotonic_ns()
+
             # Push the message to the queue
             push_start = time.time()
-            no_drop = queue.push(message_buffer)
+            no_drop = queue.push_with_header(payload, counter, timestamp_ns)
             push_end = time.time()
             push_time = (push_end - push_start) * 1000  # in milliseconds
             
             if no_drop:
-                print(f"Published: Message #{counter} at {timestamp} ms (push took {push_time:.3f} ms)")
+                print(f"Published: Message #{counter} at {timestamp_ns} ns (push took {push_time:.3f} ms)")
             else:
-                print(f"Published (with drop): Message #{counter} at {timestamp} ms (push took {push_time:.3f} ms)")
+                print(f"Published (with drop): Message #{counter} at {timestamp_ns} ns (push took {push_time:.3f} ms)")
             
             counter += 1
             
@@ -3,54 +3,113 @@
 Subscriber implementation for the shmem library using NumPy arrays.
 """
 
+import struct
 import sys
 import time
 import numpy as np
 from numpy.typing import NDArray
 from typing import Optional, Tuple, Any
-import re
+
+# Numba is optional (the "jit" extra); without it process_message runs as plain Python
+try:
+    from numba import njit
+
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args: Any, **kwargs: Any) -> Any:
+        """No-op stand-in for numba.njit when numba is not installed."""
+        return lambda func: func
+
 
 # Import the SMQueue class from our package
 from shmem import SMQueue
 
 # Constants
 QUEUE_NAME = "/my_queue_example_2"
-MESSAGE_SIZE = int(10 * 1024 * 1024)  # 10MB message size
-HEADER_SIZE = 64  # Reduced header size
+HEADER_SIZE = 64  # Header size; the element size itself comes from the queue
+HEADER_FMT = struct.Struct("<QQ")  # Binary header: message counter, send timestamp (ns)
+HEADER_BYTES = HEADER_FMT.size
+POP_TIMEOUT_MS = 100  # Upper bound on a single blocking pop
+BATCH_SIZE = 8  # Maximum number of messages drained per pop
+LOG_CAP = 4096  # Number of (msg_num, send_ns, receive_ns) samples kept between summaries
+
+# Outcomes of process_message
+STATUS_OK = 0
+STATUS_MISMATCH = 1  # Message ID did not match the expected one
+STATUS_REJECTED = 2  # Invalid timestamp or transfer time
 
 # Global variables
 running = True
 queue: Optional[SMQueue] = None
 
-# Compile regex pattern for header parsing
-HEADER_PATTERN = re.compile(r"Message #(\d+) (\d+)")
 
+if HAVE_NUMBA:
+
+    @njit(cache=True)
+    def read_header(message: NDArray[np.uint8]) -> Tuple[int, int]:
+        """Read (msg_num, send_ns) from the binary header of a message."""
+        header = message[:HEADER_BYTES].view(np.int64)
+        return header[0], header[1]
 
-def parse_header(header_bytes: NDArray[np.uint8]) -> Tuple[int, int]:
+else:
+
+    def read_header(message: NDArray[np.uint8]) -> Tuple[int, int]:
+        """Read (msg_num, send_ns) from the binary header of a message."""
+        # Interpreted, a single struct call is much cheaper than slicing and viewing the array
+        return HEADER_FMT.unpack_from(message)
+
+
+@njit(cache=True)
+def process_message(
+    message: NDArray[np.uint8],
+    receive_ns: int,
+    expected_msg_id: int,
+    running_avg: float,
+    alpha: float,
+    first_message: bool,
+    log_buf: NDArray[np.int64],
+    log_idx: int,
+) -> Tuple[int, float, int]:
     """
-    Parse the header and extract message number and timestamp.
+    Parse, log and validate one received message, and update the running average.
 
     Args:
-        header_bytes: NumPy array containing the header bytes
+        message: Received message (only the binary header is read)
+        receive_ns: Monotonic receive timestamp in nanoseconds
+        expected_msg_id: Message ID the subscriber expects next
+        running_avg: Current exponential moving average of transfer time (ms)
+        alpha: Weight of the new sample in the moving average
+        first_message: Whether no valid sample has been seen yet
+        log_buf: Ring buffer of (msg_num, send_ns, receive_ns) samples
+        log_idx: Slot in log_buf to write this sample to
 
     Returns:
-        Tuple of (message_number, timestamp)
-
-    Raises:
-        ValueError: If the header cannot be parsed
+        Tuple of (message_number, updated_running_average, status)
     """
-    # Convert bytes to string, stopping at the first null byte
-    header_str = bytes(header_bytes).split(b"\0")[0].decode("utf-8")
+    msg_num, send_ns = read_header(message)
 
-    # Use regex to extract message number and timestamp
-    match = HEADER_PATTERN.match(header_str)
-    if not match:
-        raise ValueError(f"Failed to parse header: {header_str}")
+    # Record the sample; formatting is deferred to the summary
+    log_buf[log_idx, 0] = msg_num
+    log_buf[log_idx, 1] = send_ns
+    log_buf[log_idx, 2] = receive_ns
 
-    msg_num = int(match.group(1))
-    timestamp = int(match.group(2))
+    # Only calculate transfer time if the message ID matches what we expect
+    if msg_num != expected_msg_id:
+        return msg_num, running_avg, STATUS_MISMATCH
 
-    return msg_num, timestamp
+    # Calculate transfer time in milliseconds
+    transfer_time_ms = (receive_ns - send_ns) / 1e6
+
+    # Ensure the timestamp and transfer time are sane
+    if send_ns <= 0 or transfer_time_ms < 0 or transfer_time_ms > 10000:
+        return msg_num, running_avg, STATUS_REJECTED
+
+    # Update running average using exponential moving average
+    if first_message:
+        return msg_num, transfer_time_ms, STATUS_OK
+    return msg_num, (1 - alpha) * running_avg + alpha * transfer_time_ms, STATUS_OK
 
 
 def main() -> None:
@@ -60,9 +119,15 @@ def main() -> None:
     try:
         # Open existing queue
         queue = SMQueue.open(QUEUE_NAME)
+
+        # Size everything from the queue metadata, so the subscriber always
+        # matches whatever element size the publisher created the queue with
+        element_size = queue.element_size()
+        if element_size < HEADER_SIZE:
+            raise ValueError(f"Element size {element_size} is smaller than the {HEADER_SIZE}-byte header")
         print("Subscriber started. Press Ctrl+C to stop.")
         print(
-            f"Element size: {queue.element_size()} bytes, Max elements: {queue.max_elements()}"
+            f"Element size: {element_size} bytes, Max elements: {queue.max_elements()}"
         )
 
         # For calculating running average
@@ -71,7 +136,15 @@ def main() -> None:
         first_message = True
         message_count = 0
         expected_msg_id = 0  # Track the expected message ID
-        
+        mismatched = 0  # Messages whose ID did not match the expected one
+        rejected = 0  # Messages with an invalid timestamp or transfer time
+
+        # Per-message samples are written to a preallocated ring buffer and only
+        # formatted in the periodic summary, keeping stdout off the receive path
+        log_buf: NDArray[np.int64] = np.empty((LOG_CAP, 3), dtype=np.int64)
+        log_idx = 0
+        logged = 0
+
         # Add timing for the entire loop
         loop_start_time = time.time()
         messages_processed = 0
@@ -79,69 +152,50 @@ def main() -> None:
         print("Starting message processing loop...")
 
         while running:
-            # Try to pop a message (non-blocking)
-            # The profiling is now built into the try_pop_np method
-            message: Optional[NDArray[np.uint8]] = queue.pop_np()
-            
-            if message is not None:
-                messages_processed += 1
-                # Get current time for latency calculation in milliseconds
-                receive_time = time.time() * 1000  # milliseconds since epoch
-
-                # Parse header
-                try:
-                    msg_num, send_timestamp = parse_header(message[:HEADER_SIZE])
-
-                    # Print basic message info
-                    print(f"Received: Message #{msg_num}")
-                    print(f"  Send timestamp: {send_timestamp} ms, Receive timestamp: {receive_time} ms")
-                    print(f"  Time difference: {receive_time - send_timestamp} ms")
-
-                    # Only calculate transfer time if the message ID matches what we expect
-                    if msg_num == expected_msg_id:
-                        # Ensure the timestamp is valid
-                        if send_timestamp <= 0 or send_timestamp > receive_time:
-                            print(f"  Invalid timestamp: {send_timestamp}")
-                        else:
-                            # Calculate transfer time in milliseconds
-                            # Both receive_time and send_timestamp are now in milliseconds
-                            transfer_time_ms = receive_time - send_timestamp
-
-                            # Sanity check on transfer time
-                            if transfer_time_ms < 0 or transfer_time_ms > 10000:
-                                print(
-                                    f"  Suspicious transfer time: {transfer_time_ms}ms, ignoring"
-                                )
-                            else:
-                                message_count += 1
-
-                                # Update running average using exponential moving average
-                                if first_message:
-                                    running_avg = transfer_time_ms
-                                    first_message = False
-                                else:
-                                    running_avg = (
-                                        1 - alpha
-                                    ) * running_avg + alpha * transfer_time_ms
-
-                                # Print timing information
-                                print(f"  Transfer time: {transfer_time_ms:.3f} ms")
-                                print(
-                                    f"  Running average: {running_avg:.3f} ms (over {message_count} messages)"
-                                )
+            # Pop a zero-copy (n, element_size) view of up to BATCH_SIZE queued
+            # messages; the view aliases the shared-memory slots, so no
+            # element-sized copy is made. The wait sleeps in the kernel until the
+            # publisher posts, with a timeout so the statistics below are still
+            # reported while the queue is idle
+            batch: Optional[NDArray[np.uint8]] = queue.pop_batch(
+                BATCH_SIZE, timeout_ms=POP_TIMEOUT_MS
+            )
+
+            if batch is not None:
+                # Get current time for latency calculation in nanoseconds
+                receive_ns = time.monotonic_ns()
+
+                for i in range(batch.shape[0]):
+                    messages_processed += 1
+
+                    # Handle the message in compiled code
+                    msg_num, running_avg, status = process_message(
+                        batch[i],
+                        receive_ns,
+                        expected_msg_id,
+                        running_avg,
+                        alpha,
+                        first_message,
+                        log_buf,
+                        log_idx,
+                    )
+                    log_idx = (log_idx + 1) % LOG_CAP
+                    logged += 1
+
+                    if status == STATUS_OK:
+                        message_count += 1
+                        first_message = False
+                    elif status == STATUS_MISMATCH:
+                        mismatched += 1
                     else:
-                        print(f"  Message ID mismatch. Expected: {expected_msg_id}, Got: {msg_num}")
-                    
+                        rejected += 1
+
                     # Update expected message ID for next message
                     expected_msg_id = msg_num + 1
 
-                except ValueError as e:
-                    print(f"Error parsing message: {e}")
-            else:
-                # Queue is empty, wait a bit before trying again
-                # Reduce the sleep time to minimize polling delay
-                time.sleep(0.001)  # 1 millisecond (was 100 microseconds)
-            
+                # Drop the view so the slots are released before the next pop
+                del batch
+
             # Calculate and print loop statistics every 10 seconds
             current_time = time.time()
             elapsed_time = current_time - loop_start_time
@@ -151,11 +205,25 @@ def main() -> None:
                 print(f"  Messages processed: {messages_processed}")
                 print(f"  Elapsed time: {elapsed_time:.2f} seconds")
                 print(f"  Processing rate: {loop_rate:.2f} messages/second")
-                print(f"  Average processing time: {1000/loop_rate if loop_rate > 0 else 0:.2f} ms/message\n")
-                
+                print(f"  Average processing time: {1000/loop_rate if loop_rate > 0 else 0:.2f} ms/message")
+
+                # Summarize the samples logged since the last summary
+                samples = log_buf[: min(logged, LOG_CAP)]
+                if len(samples) > 0:
+                    transfer_times_ms = (samples[:, 2] - samples[:, 1]) / 1e6
+                    print(f"  Last message: #{log_buf[(log_idx - 1) % LOG_CAP, 0]}")
+                    print(
+                        f"  Transfer time (last {len(samples)}): min {transfer_times_ms.min():.3f} ms, "
+                        f"avg {transfer_times_ms.mean():.3f} ms, max {transfer_times_ms.max():.3f} ms"
+                    )
+                print(f"  Running average: {running_avg:.3f} ms (over {message_count} messages)")
+                print(f"  ID mismatches: {mismatched}, rejected timestamps: {rejected}\n")
+
                 # Reset statistics
                 loop_start_time = current_time
                 messages_processed = 0
+                log_idx = 0
+                logged = 0
 
     except Exception as e:
         print(f"Error: {e}")
@@ -4,12 +4,14 @@ Performance test for the shmem library.
 Tests the transfer time between publisher and subscriber processes.
 """
 
+import gc
 import os
+import struct
+import sys
 import time
-import random
 import multiprocessing
-from multiprocessing import Manager
-from typing import Optional, List, Any, Dict
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, List, Any, Set, Tuple
 import numpy as np
 from numpy.typing import NDArray
 import pytest
@@ -23,187 +25,363 @@ MESSAGE_SIZE = 10 * 1024 * 1024  # 10MB message size
 MAX_ELEMENTS = 10  # Maximum number of elements in the queue
 HEADER_SIZE = 64  # Header size
 TEST_DURATION = 2  # Run test for 5 seconds
+READY_TIMEOUT = 2.0  # Seconds the subscriber waits for the publisher to create the queue
 MIN_MESSAGES_REQUIRED = 10  # Minimum number of messages required for a valid test
+DELAY_THRESHOLD_MS = 3.0  # Maximum allowed p99 transfer time
 
+MAX_DELAYS = 65536  # Capacity of the shared delay results array
+RESULTS_SIZE = 16 + 8 * MAX_DELAYS  # Bytes in the shared results block
+DEBUG = os.environ.get("PYSHMEM_DEBUG") == "1"  # Log every published message
+SPIN_LIMIT = 1024  # Empty polls before the subscriber yields its CPU
 
-def benchmark_raw_memcpy_bandwidth(buffer_size_bytes: int, iterations: int = 100) -> float:
+# Environment overrides for the CPUs the publisher and subscriber are pinned to
+PUB_CPU_ENV = "PYSHMEM_PUB_CPU"
+SUB_CPU_ENV = "PYSHMEM_SUB_CPU"
+
+RT_ENV = "PYSHMEM_RT"  # Set to "1" to run both processes under SCHED_FIFO
+RT_PRIORITY = 20  # SCHED_FIFO priority used when RT_ENV is set
+
+_SYSFS_CPU = "/sys/devices/system/cpu"
+_SYSFS_NODE = "/sys/devices/system/node"
+
+# Binary message header: message counter, send timestamp (ns), as written by
+# SMQueue.push_with_header
+_HDR = struct.Struct("<QQ")
+
+# Fork the test processes on Linux, so they start in milliseconds with NumPy and
+# shmem already imported instead of re-importing them (spawn is the default on
+# macOS, and forkserver on Linux from Python 3.14). Uses a context rather than
+# set_start_method so the rest of the pytest session is unaffected
+_MP = multiprocessing.get_context("fork" if sys.platform == "linux" else None)
+
+
+def _read_cpulist(path: str) -> List[int]:
     """
-    Benchmarks raw memory copy speed using numpy arrays.
+    Read a sysfs CPU list such as "0-3,8-11".
 
     Args:
-        buffer_size_bytes: The size of the buffer to copy in bytes.
-        iterations: The number of times to perform the copy.
+        path: sysfs file holding the list
 
     Returns:
-        The calculated bandwidth in GB/s, or 0.0 if calculation is not reliable.
+        Sorted CPU indices, or an empty list if the file is missing
     """
-    if buffer_size_bytes == 0 or iterations == 0:
-        print("Warning: memcpy benchmark called with zero buffer size or iterations.")
-        return 0.0
+    try:
+        with open(path) as f:
+            text = f.read().strip()
+    except OSError:
+        return []
+
+    cpus: Set[int] = set()
+    for part in filter(None, text.split(",")):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def pick_cores() -> Tuple[Optional[int], Optional[int]]:
+    """
+    Pick the (publisher, subscriber) CPUs for the test.
+
+    Both come from the same NUMA node, so the queue's cache lines never cross
+    the interconnect, and from different physical cores, so the two processes
+    do not share one core's execution units via SMT. PUB_CPU_ENV and
+    SUB_CPU_ENV override the choice.
+
+    Returns:
+        Tuple of CPU indices; None where no CPU could be picked
+    """
+    allowed = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set()
+
+    # Prefer the first NUMA node that has two usable cores; without NUMA
+    # information, treat all allowed CPUs as one node
+    nodes = [
+        _read_cpulist(os.path.join(_SYSFS_NODE, entry, "cpulist"))
+        for entry in sorted(os.listdir(_SYSFS_NODE) if os.path.isdir(_SYSFS_NODE) else [])
+        if entry.startswith("node") and entry[4:].isdigit()
+    ]
+    candidates: List[int] = []
+    for node_cpus in nodes + [sorted(allowed)]:
+        # Keep one hardware thread (the lowest) per physical core
+        candidates = [
+            cpu
+            for cpu in node_cpus
+            if cpu in allowed
+            and min(
+                _read_cpulist(os.path.join(_SYSFS_CPU, f"cpu{cpu}", "topology", "thread_siblings_list"))
+                or [cpu]
+            )
+            == cpu
+        ]
+        if len(candidates) >= 2:
+            break
+
+    # Skip CPU 0 when possible; it services most interrupts
+    if len(candidates) > 2 and candidates[0] == 0:
+        candidates = candidates[1:]
+
+    pub_core = candidates[0] if candidates else None
+    sub_core = candidates[1] if len(candidates) >= 2 else pub_core
+
+    if PUB_CPU_ENV in os.environ:
+        pub_core = int(os.environ[PUB_CPU_ENV])
+    if SUB_CPU_ENV in os.environ:
+        sub_core = int(os.environ[SUB_CPU_ENV])
+
+    return pub_core, sub_core
+
+
+def pin_to_core(core: Optional[int], pid: int = 0) -> None:
+    """
+    Pin a process to a single CPU.
+
+    Keeping publisher and subscriber on fixed cores stops the scheduler from
+    migrating them mid-test, which otherwise shows up as tail latency.
+
+    Args:
+        core: CPU index to run on; ignored if None or unavailable
+        pid: Process to pin (0 for the calling process)
+    """
+    if core is None or not hasattr(os, "sched_setaffinity"):
+        return
 
     try:
-        source_buffer = np.ones(buffer_size_bytes, dtype=np.uint8)
-        dest_buffer = np.zeros(buffer_size_bytes, dtype=np.uint8)
-    except MemoryError:
-        print(f"Warning: MemoryError allocating buffers for memcpy benchmark (size: {buffer_size_bytes} bytes).")
-        return 0.0
+        os.sched_setaffinity(pid, {core})
+    except OSError:
+        # CPU not in the allowed set, or the process has already exited
+        pass
 
 
-    # Warm-up copy
-    np.copyto(dest_buffer, source_buffer)
+def make_realtime(pid: int) -> None:
+    """
+    Move a process to the SCHED_FIFO real-time policy if RT_ENV is set.
 
-    start_time = time.perf_counter()
-    for _ in range(iterations):
-        np.copyto(dest_buffer, source_buffer)
-    end_time = time.perf_counter()
+    A real-time process is not preempted by ordinary tasks on its CPU, which
+    removes scheduler jitter from the tail. Both processes get the same
+    priority, so the subscriber's sched_yield still lets the publisher run
+    when they share a CPU.
 
-    total_time_seconds = end_time - start_time
+    Args:
+        pid: Process to move
+    """
+    if os.environ.get(RT_ENV) != "1" or not hasattr(os, "sched_setscheduler"):
+        return
 
-    if total_time_seconds <= 1e-9:  # Avoid division by zero or extremely small, unreliable time
-        print(
-            f"Warning: memcpy benchmark recorded non-positive or extremely small time ({total_time_seconds:.9f}s)."
-            " Cannot reliably calculate bandwidth."
-        )
-        return 0.0  # Return 0.0 if time is too small to be reliable
+    try:
+        os.sched_setscheduler(pid, os.SCHED_FIFO, os.sched_param(RT_PRIORITY))
+    except PermissionError:
+        # Real-time scheduling requires CAP_SYS_NICE
+        print(f"Could not set SCHED_FIFO for PID {pid} (needs CAP_SYS_NICE)")
+    except OSError:
+        # The process has already exited
+        pass
 
-    # Calculate bandwidth in GB/s (Gigabytes per second, 1 GB = 1024^3 bytes)
-    total_data_copied_gb = (buffer_size_bytes * iterations) / (1024 * 1024 * 1024)
-    bandwidth_gb_per_sec = total_data_copied_gb / total_time_seconds
 
-    return bandwidth_gb_per_sec
+def raise_priority() -> None:
+    """Raise the calling process's scheduling priority if permitted."""
+    try:
+        os.nice(-5)
+    except PermissionError:
+        # Raising priority requires CAP_SYS_NICE
+        pass
 
 
-def publisher_process(min_delay_ms: int = 1, max_delay_ms: int = 100) -> None:
+def results_views(buf: Any) -> Tuple[NDArray[np.int64], NDArray[np.int64]]:
+    """
+    Map the shared results block as (count, delays) arrays.
+
+    The block holds an int64 count of recorded delays, padded to 16 bytes,
+    followed by MAX_DELAYS int64 delays in nanoseconds. Only the
+    subscriber writes it, so no lock is needed.
+
+    Args:
+        buf: Buffer of a SharedMemory block of RESULTS_SIZE bytes
+
+    Returns:
+        Tuple of (one-element count array, delays array)
+    """
+    count = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+    delays = np.ndarray((MAX_DELAYS,), dtype=np.int64, buffer=buf, offset=16)
+    return count, delays
+
+
+def publisher_process(
+    stop: Any, ready: Any, core: Optional[int] = None, min_delay_ms: int = 1, max_delay_ms: int = 100
+) -> None:
     """
     Publisher process function.
 
     Args:
+        stop: multiprocessing.Event; the loop stops when it is set
+        ready: multiprocessing.Event set once the queue has been created
+        core: CPU to pin the process to (None leaves it unpinned)
         min_delay_ms: Minimum delay between messages in milliseconds
         max_delay_ms: Maximum delay between messages in milliseconds
     """
+    # (counter, timestamp_ns) of each message, printed after the run in DEBUG
+    # mode so that no stdout write lands between two pushes
+    published: List[Tuple[int, int]] = []
+
     try:
         print(f"Publisher process started (PID: {os.getpid()})")
+        pin_to_core(core)
+        raise_priority()
 
         # Create queue
         queue = SMQueue.create(QUEUE_NAME, MAX_ELEMENTS, MESSAGE_SIZE)
 
-        # Pre-allocate buffer for message and pre-fill with random data
-        message_buffer: NDArray[np.uint8] = np.zeros(MESSAGE_SIZE, dtype=np.uint8)
+        # Fault in the shared-memory slots now, so the first messages do not
+        # pay a minor page fault per 4KB page inside the timed loop
+        queue.prefault()
+
+        # Keep the slots resident for the whole run; best effort, as it needs
+        # CAP_IPC_LOCK or a large enough RLIMIT_MEMLOCK
+        if not queue.lock_memory():
+            print("Publisher could not lock the queue memory (RLIMIT_MEMLOCK)")
+
+        # Let the subscriber open the queue
+        ready.set()
 
-        # Fill the buffer with random data once (after header)
-        message_buffer[HEADER_SIZE:] = np.random.randint(
+        # Generate the payload only, with random data, once; push_with_header
+        # writes the header into the queue slot itself
+        rng = np.random.default_rng()
+        payload: NDArray[np.uint8] = rng.integers(
             0, 256, size=MESSAGE_SIZE - HEADER_SIZE, dtype=np.uint8
         )
 
-        counter = 0
-        start_time = time.time()
+        # Draw the random inter-message delays (in seconds) up front, enough for
+        # the whole run at the minimum delay, so the loop only indexes a list
+        send_delays: List[float] = (
+            rng.uniform(min_delay_ms, max_delay_ms, size=TEST_DURATION * 1000 // min_delay_ms + 1) / 1000.0
+        ).tolist()
 
-        while (time.time() - start_time) < TEST_DURATION:
-            # Get current timestamp in milliseconds
-            timestamp = time.time() * 1000  # milliseconds since epoch
+        # Collect once and keep the cyclic garbage collector out of the
+        # timed loop; the loop creates no reference cycles
+        gc.collect()
+        gc.disable()
 
-            # Create message header with timestamp and counter
-            header = f"Message #{counter} {timestamp}".encode("utf-8")
-            header_len = len(header)
+        counter = 0
+        start_time = time.monotonic()
 
-            # Copy header to the beginning of the buffer
-            message_buffer[:header_len] = np.frombuffer(header, dtype=np.uint8)
+        while not stop.is_set() and (time.monotonic() - start_time) < TEST_DURATION:
+            # Get current timestamp in nanoseconds; the monotonic clock is
+            # shared across processes and is not stepped by NTP adjustments
+            timestamp_ns = time.monotonic_ns()
 
             # Push the message to the queue
-            queue.push(message_buffer)
+            queue.push_with_header(payload, counter, timestamp_ns)
 
-            print(f"Published: Message #{counter} at {timestamp:.0f} ms")
+            if DEBUG:
+                published.append((counter, timestamp_ns))
 
             counter += 1
 
             # Random delay between min_delay_ms and max_delay_ms milliseconds
-            delay = (
-                random.uniform(min_delay_ms, max_delay_ms) / 1000.0
-            )  # Convert to seconds
-            time.sleep(delay)
+            time.sleep(send_delays[counter % len(send_delays)])
 
     except Exception as e:
         print(f"Publisher error: {e}")
     finally:
+        for counter, timestamp_ns in published:
+            print(f"Published: Message #{counter} at {timestamp_ns} ns")
         print("Publisher process exiting")
 
 
-def subscriber_process(shared_data_dict: Dict[str, Any]) -> None:
+def subscriber_process(
+    stop: Any, ready: Any, results_name: str, core: Optional[int] = None
+) -> None:
     """
     Subscriber process function.
 
     Args:
-        shared_data_dict: Dictionary for sharing data between processes
+        stop: multiprocessing.Event; checked whenever the queue has been empty for SPIN_LIMIT polls
+        ready: multiprocessing.Event the publisher sets once the queue exists
+        results_name: Name of the SharedMemory block the delays are written to (see results_views)
+        core: CPU to pin the process to (None leaves it unpinned)
     """
     print(f"Subscriber process started (PID: {os.getpid()})")
+    pin_to_core(core)
+    raise_priority()
 
-    # Wait a bit for the publisher to create the queue
-    time.sleep(0.1)
+    # Wait for the publisher to create the queue
+    if not ready.wait(timeout=READY_TIMEOUT):
+        print("Subscriber timed out waiting for the publisher to create the queue")
+        return
 
     # Open the queue
     queue = SMQueue.open(QUEUE_NAME)
 
     # Keep track of received messages
     received_count = 0
+    skipped_count = 0
     expected_msg_id = 0
 
     # Local max delay for this process
-    local_max_delay = 0.0
-    # Local delays list
-    local_delays: List[float] = []
-
-    recv_buf: NDArray[np.uint8] = np.zeros(MESSAGE_SIZE, dtype=np.uint8)
-
-    start_time = time.time()
-    while shared_data_dict["running"] and (time.time() - start_time) < TEST_DURATION:
-        success = queue.try_pop_into(recv_buf)
-        # At this point msg_view holds the message data (zero-copy or copied)
-        if success: # Get current time for latency calculation in milliseconds
-            receive_time = time.time() * 1000  # milliseconds since epoch
-
-            # Convert bytes to string, stopping at the first null byte
-            header_str = (
-                bytes(recv_buf[:HEADER_SIZE]).split(b"\0")[0].decode("utf-8")
-            )
+    local_max_delay_ns = 0
+    # Delays are written straight into the parent's shared results block
+    results = SharedMemory(name=results_name)
+    delay_count, delays = results_views(results.buf)
+
+    # Only the header is needed to measure latency, so each pop copies just
+    # the header into this small reused buffer and the payload is skipped
+    recv_hdr: NDArray[np.uint8] = np.zeros(_HDR.size, dtype=np.uint8)
 
-            # Extract message number and timestamp
-            message_literal, msg_num, send_timestamp = header_str.split()
-            # Remove the "Message #" prefix
-            msg_num = int(msg_num.split("#")[1])
-            send_timestamp = float(send_timestamp)
+    # Consecutive polls that found the queue empty
+    spins = 0
 
-            print(f"Received: Message #{msg_num}, Expected: #{expected_msg_id}")
+    # Collect once and keep the cyclic garbage collector out of the
+    # timed loop; the loop creates no reference cycles
+    gc.collect()
+    gc.disable()
+
+    start_time = time.monotonic()
+    while (time.monotonic() - start_time) < TEST_DURATION:
+        success = queue.try_pop_header_into(recv_hdr)
+        if success: # Get current time for latency calculation in nanoseconds
+            receive_time_ns = time.monotonic_ns()
+
+            # Extract message number and timestamp from the binary header
+            msg_num, send_timestamp_ns = _HDR.unpack_from(recv_hdr, 0)
 
             # Only process messages with the expected ID
             if msg_num == expected_msg_id:
-                # Calculate transfer time in milliseconds
-                transfer_time_ms = receive_time - send_timestamp
-
-                print(f"  Transfer time: {transfer_time_ms} ms")
+                # Calculate transfer time; kept in integer nanoseconds and
+                # only converted to milliseconds by the parent when reporting
+                transfer_time_ns = receive_time_ns - send_timestamp_ns
 
                 # Record the delay
-                local_delays.append(transfer_time_ms)
+                if delay_count[0] < MAX_DELAYS:
+                    delays[delay_count[0]] = transfer_time_ns
+                    delay_count[0] += 1
 
                 # Update max delay observed
-                if transfer_time_ms > local_max_delay:
-                    local_max_delay = transfer_time_ms
+                if transfer_time_ns > local_max_delay_ns:
+                    local_max_delay_ns = transfer_time_ns
 
                 # Increment expected message ID for next message
                 expected_msg_id += 1
             else:
-                print(
-                    f"  Skipping message with unexpected ID (got {msg_num}, expected {expected_msg_id})"
-                )
+                skipped_count += 1
 
             received_count += 1
-
-        # Small sleep to prevent CPU spinning
-        time.sleep(0.0001)
-    # Update shared data with results from this process
-    shared_data_dict["delays"] = local_delays
-    shared_data_dict["max_delay"] = local_max_delay
-    print(f"Subscriber process exiting. Received {received_count} messages.")
-    print(f"Max delay observed: {local_max_delay} ms")
+            spins = 0
+        else:
+            # Busy-poll rather than sleep: even a 100us sleep costs a context
+            # switch and dwarfs the latency being measured. After SPIN_LIMIT
+            # empty polls, yield so a publisher sharing this CPU can run
+            spins += 1
+            if spins >= SPIN_LIMIT:
+                # Checking the stop event takes a cross-process lock, so it is
+                # only done here rather than on every poll
+                if stop.is_set():
+                    break
+                os.sched_yield()
+                spins = 0
+
+    # Release the views before detaching from the results block
+    del delay_count, delays
+    results.close()
+    print(f"Subscriber process exiting. Received {received_count} messages ({skipped_count} with unexpected ID).")
+    print(f"Max delay observed: {local_max_delay_ns / 1_000_000} ms")
 
 
 def cleanup() -> None:
@@ -219,34 +397,47 @@ def test_transfer_time() -> None:
     """
     Test the transfer time between publisher and subscriber processes.
 
-    The test runs for TEST_DURATION seconds and ensures that the maximum
-    observed delay is less than 5ms.
+    The test runs for TEST_DURATION seconds and ensures that the p99
+    observed delay is less than DELAY_THRESHOLD_MS.
     """
 
-    # Create a manager for sharing data between processes
-    manager = Manager()
-    shared_data_dict = manager.dict()
-    shared_data_dict["delays"] = []
-    shared_data_dict["max_delay"] = 0.0
-    shared_data_dict["running"] = True
+    # Shared state between processes: both children watch the stop event, and
+    # the subscriber writes its delays into a shared array the parent reads
+    # after join, with no pickling
+    stop = _MP.Event()
+    ready = _MP.Event()
+    results = SharedMemory(create=True, size=RESULTS_SIZE)
+    delay_count, delays = results_views(results.buf)
+    delay_count[0] = 0
 
     # Clean up any existing shared memory
     cleanup()
 
+    # Pin both processes to separate physical cores on one NUMA node
+    pub_core, sub_core = pick_cores()
+    print(f"Publisher CPU: {pub_core}, subscriber CPU: {sub_core}")
+
     # Create and start the processes
-    pub_process = multiprocessing.Process(target=publisher_process)
-    sub_process = multiprocessing.Process(
-        target=subscriber_process, args=(shared_data_dict,)
+    pub_process = _MP.Process(target=publisher_process, args=(stop, ready, pub_core))
+    sub_process = _MP.Process(
+        target=subscriber_process, args=(stop, ready, results.name, sub_core)
     )
 
     pub_process.start()
     sub_process.start()
 
+    # Pin from the parent as well, so the children are placed before they get
+    # far enough to pin themselves
+    pin_to_core(pub_core, pub_process.pid)
+    pin_to_core(sub_core, sub_process.pid)
+    make_realtime(pub_process.pid)
+    make_realtime(sub_process.pid)
+
     # Wait for the test duration
     time.sleep(TEST_DURATION + 1)  # Add 1 second buffer
 
     # Signal processes to stop
-    shared_data_dict["running"] = False
+    stop.set()
 
     # Wait for processes to finish
     pub_process.join(timeout=2)
@@ -258,88 +449,55 @@ def test_transfer_time() -> None:
     if sub_process.is_alive():
         sub_process.terminate()
 
+    # Convert the recorded delays to milliseconds (this also copies them out)
+    # and free the results block
+    delays_recorded = delays[: delay_count[0]] / 1_000_000
+    del delay_count, delays
+    results.close()
+    results.unlink()
+
     # Clean up shared memory
     cleanup()
 
-    # Get the results from the shared data
-    delays_recorded = shared_data_dict.get("delays", [])
-
-    # --- Raw memcpy Benchmark (run this regardless of shmem results for baseline) ---
-    print("\n=== Raw memcpy Benchmark ===")
-    memcpy_iterations = 100  # Number of iterations for memcpy test
-    # Ensure MESSAGE_SIZE is appropriate, or use a fixed large buffer size for memcpy
-    raw_memcpy_bandwidth_gbps = benchmark_raw_memcpy_bandwidth(MESSAGE_SIZE, iterations=memcpy_iterations)
-    if raw_memcpy_bandwidth_gbps > 0:
-        print(
-            f"Raw memcpy Bandwidth ({MESSAGE_SIZE / (1024*1024):.0f}MB x {memcpy_iterations} iterations):"
-            f" {raw_memcpy_bandwidth_gbps:.3f} GB/s"
-        )
-    else:
-        print(
-            f"Raw memcpy Bandwidth ({MESSAGE_SIZE / (1024*1024):.0f}MB x {memcpy_iterations} iterations):"
-            " Could not be determined."
-        )
-    # --- End Raw memcpy Benchmark ---
-
-    if not delays_recorded:
-        print("\nShmem Performance: N/A (no messages processed or delays recorded by subscriber).")
-        print("Shmem Overhead vs Raw memcpy: N/A (cannot compare without shmem data).")
+    if delays_recorded.size == 0:
+        print("\nShmem latency: N/A (no messages processed or delays recorded by subscriber).")
         pytest.fail("No delays were recorded by the subscriber, cannot calculate shmem performance.")
 
-    # Drop the top 10% of delays as potential outliers
-    delays_filtered = sorted(delays_recorded)[: int(len(delays_recorded) * 0.9)]
+    # Summarize the typical delay with a symmetric trimmed mean: drop the
+    # slowest and the fastest 5% alike, rather than only the slowest 10%, which
+    # biased the average low. np.quantile selects rather than fully sorts. The
+    # p50/p99 of the full run are kept as the honest tail metrics
+    p5_delay_ms, p50_delay_ms, p95_delay_ms, p99_delay_ms = (
+        float(q) for q in np.quantile(delays_recorded, [0.05, 0.5, 0.95, 0.99])
+    )
+    delays_filtered = delays_recorded[
+        (delays_recorded >= p5_delay_ms) & (delays_recorded <= p95_delay_ms)
+    ]
 
-    if not delays_filtered:
+    if delays_filtered.size == 0:
         print("\n=== Performance Test Results ===")
         print(f"Original number of messages recorded: {len(delays_recorded)}")
-        print("Not enough messages to calculate shmem statistics after dropping top 10% outliers.")
-        print("Shmem Overhead vs Raw memcpy: N/A (cannot compare without shmem data).")
+        print("Not enough messages to calculate shmem statistics after trimming to p5-p95.")
         pytest.fail(
             "No messages left after filtering outliers, cannot calculate shmem performance statistics."
         )
 
     # Calculate shmem statistics from filtered delays
-    avg_delay_ms = sum(delays_filtered) / len(delays_filtered)
-    min_delay_ms = min(delays_filtered)
-    max_delay_ms = max(delays_filtered)
-
-    print("\n=== Shmem Performance Test Results ===")
+    avg_delay_ms = float(delays_filtered.mean())
+    min_delay_ms = float(delays_filtered.min())
+    max_delay_ms = float(delays_filtered.max())
+
+    # The subscriber pops only the header, so these are one-way latencies from
+    # push_with_header to the header being received; the payload is never
+    # copied out of the queue, so no bandwidth figure can be derived from them
+    print("\n=== Shmem One-Way Latency Results ===")
     print(f"Number of messages originally recorded: {len(delays_recorded)}")
-    print(f"Number of valid messages processed (after 10% outlier drop): {len(delays_filtered)}")
+    print(f"Number of valid messages processed (within p5-p95): {len(delays_filtered)}")
     print(f"Minimum delay: {min_delay_ms:.3f} ms")
     print(f"Average delay: {avg_delay_ms:.3f} ms")
     print(f"Maximum delay: {max_delay_ms:.3f} ms")
-
-    # Calculate shmem bandwidth
-    shmem_avg_latency_seconds = avg_delay_ms / 1000.0
-    shmem_bandwidth_gbps = 0.0
-    if shmem_avg_latency_seconds > 0:
-        shmem_bandwidth_gbps = (MESSAGE_SIZE / shmem_avg_latency_seconds) / (1024**3)
-        print(f"Shmem Average Bandwidth: {shmem_bandwidth_gbps:.3f} GB/s (based on avg delay)")
-    else:
-        print("Shmem Average Bandwidth: N/A (average delay is zero or invalid)")
-
-    # Calculate and print overhead
-    print("\n=== Comparison: Shmem vs Raw memcpy ===")
-    if raw_memcpy_bandwidth_gbps > 0 and shmem_bandwidth_gbps > 0:
-        if shmem_bandwidth_gbps > raw_memcpy_bandwidth_gbps:
-            overhead_percentage = (
-                (shmem_bandwidth_gbps - raw_memcpy_bandwidth_gbps) / raw_memcpy_bandwidth_gbps
-            ) * 100
-            print(
-                f"Note: Shmem bandwidth ({shmem_bandwidth_gbps:.3f} GB/s) appears "
-                f"HIGHER than raw memcpy ({raw_memcpy_bandwidth_gbps:.3f} GB/s)."
-            )
-            print(f"  This is unexpected. Calculated 'gain' over memcpy: {overhead_percentage:.2f}%")
-        else:
-            overhead_percentage = (
-                (raw_memcpy_bandwidth_gbps - shmem_bandwidth_gbps) / raw_memcpy_bandwidth_gbps
-            ) * 100
-            print(f"Shmem Overhead compared to Raw memcpy: {overhead_percentage:.2f}%")
-    elif raw_memcpy_bandwidth_gbps <= 0:
-        print("Shmem Overhead vs Raw memcpy: N/A (raw memcpy bandwidth could not be determined).")
-    else: # shmem_bandwidth_gbps <= 0
-        print("Shmem Overhead vs Raw memcpy: N/A (shmem bandwidth is zero or invalid).")
+    print(f"p50 delay (all messages): {p50_delay_ms:.3f} ms")
+    print(f"p99 delay (all messages): {p99_delay_ms:.3f} ms")
 
     # Check if enough valid (filtered) messages were processed
     if len(delays_filtered) < MIN_MESSAGES_REQUIRED:
@@ -348,9 +506,9 @@ def test_transfer_time() -> None:
             f"Got {len(delays_filtered)}, need at least {MIN_MESSAGES_REQUIRED}"
         )
 
-    # Assert that the average delay is within the threshold
-    assert avg_delay_ms < 3.0, (
-        f"Average shmem delay ({avg_delay_ms:.3f} ms) exceeds threshold (3.0 ms)"
+    # Assert on the tail rather than the trimmed average, so tail regressions fail the test
+    assert p99_delay_ms < DELAY_THRESHOLD_MS, (
+        f"p99 shmem delay ({p99_delay_ms:.3f} ms) exceeds threshold ({DELAY_THRESHOLD_MS} ms)"
     )
 
 
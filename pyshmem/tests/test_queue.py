@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Functional tests for the shmem library.
+Tests message framing, zero-copy view lifetimes and argument validation.
+"""
+
+import itertools
+import os
+import struct
+from typing import Callable, Iterator
+
+import numpy as np
+import pytest
+
+# Import the SMQueue class from our package
+from shmem import SMQueue
+
+# Constants
+MAX_ELEMENTS = 4  # Small ring so tests reach the full-queue case quickly
+ELEMENT_SIZE = 256  # Element size in bytes
+HEADER_SIZE = 64  # Header size written by SMQueue.push_with_header
+PAYLOAD_SIZE = ELEMENT_SIZE - HEADER_SIZE
+
+# Binary message header: message counter, send timestamp (ns)
+_HDR = struct.Struct("<QQ")
+
+# Suffixes that keep queue names unique (and within the 24-character name limit)
+_QUEUE_IDS = itertools.count()
+
+
+@pytest.fixture
+def queue() -> Iterator[SMQueue]:
+    """Create a fresh, uniquely named queue and destroy it afterwards."""
+    name = f"/test_queue_{os.getpid()}_{next(_QUEUE_IDS)}"
+    try:
+        SMQueue.destroy(name)
+    except Exception:
+        pass
+
+    q = SMQueue.create(name, MAX_ELEMENTS, ELEMENT_SIZE)
+    yield q
+    q.close()
+    SMQueue.destroy(name)
+
+
+def message(value: int) -> np.ndarray:
+    """Build a full-size message filled with value."""
+    return np.full(ELEMENT_SIZE, value, dtype=np.uint8)
+
+
+def test_header_round_trip(queue: SMQueue) -> None:
+    """push_with_header frames the header in front of the payload."""
+    payload = np.arange(PAYLOAD_SIZE, dtype=np.uint8)
+    assert queue.push_with_header(payload, 42, 123456789)
+
+    msg = queue.try_pop_np()
+    assert msg is not None
+    assert _HDR.unpack_from(msg) == (42, 123456789)
+    np.testing.assert_array_equal(msg[HEADER_SIZE:], payload)
+
+    # The header-only pop reads the same fields and discards the rest
+    assert queue.push_with_header(payload, 7, 8)
+    header = np.zeros(_HDR.size, dtype=np.uint8)
+    assert queue.try_pop_header_into(header)
+    assert _HDR.unpack_from(header) == (7, 8)
+    assert queue.try_pop_np() is None
+
+
+def test_full_queue_with_outstanding_view(queue: SMQueue) -> None:
+    """A live view protects its slot: a full queue rejects pushes until it is dropped."""
+    for i in range(MAX_ELEMENTS):
+        assert queue.push(message(i))
+
+    view = queue.pop_view(0)
+    assert view is not None
+    assert view[0] == 0
+
+    # The slot the view reads is the next one push would write, so the push is rejected
+    assert not queue.push(message(99))
+    assert view[0] == 0
+
+    del view
+
+    # With the view released, the slot is free again; the next push fills the queue and the one after
+    # drops the oldest message (reported by returning False) instead of being rejected
+    assert queue.push(message(MAX_ELEMENTS))
+    assert not queue.push(message(100))
+    received = []
+    while (msg := queue.try_pop_np()) is not None:
+        received.append(int(msg[0]))
+    assert received == [2, 3, MAX_ELEMENTS, 100]
+
+
+def test_pop_view_reassignment_loop(queue: SMQueue) -> None:
+    """Rebinding the view in a loop releases each previous slot, so pushes keep succeeding."""
+    for i in range(MAX_ELEMENTS - 2):
+        assert queue.push(message(i))
+
+    # The new view is taken while the previous one is still bound, so the oldest held slot is released
+    # out of order; the queue must reclaim it or the pushes below would start failing
+    received = []
+    for i in range(MAX_ELEMENTS - 2, 10 * MAX_ELEMENTS):
+        v = queue.pop_view(0)
+        assert v is not None
+        received.append(int(v[0]))
+        assert queue.push(message(i))
+
+    del v
+    assert received == list(range(10 * MAX_ELEMENTS - (MAX_ELEMENTS - 2)))
+
+
+def test_batch_release(queue: SMQueue) -> None:
+    """All slots of a batch view are released together when the view is dropped."""
+    for i in range(MAX_ELEMENTS):
+        assert queue.push(message(i))
+
+    batch = queue.pop_batch(MAX_ELEMENTS, 0)
+    assert batch is not None
+    assert batch.shape == (MAX_ELEMENTS, ELEMENT_SIZE)
+    np.testing.assert_array_equal(batch[:, 0], np.arange(MAX_ELEMENTS))
+
+    # Every slot is held by the batch
+    assert not queue.push(message(99))
+
+    del batch
+
+    for i in range(MAX_ELEMENTS):
+        assert queue.push(message(10 + i))
+    assert not queue.push(message(99))
+    received = []
+    while (msg := queue.try_pop_np()) is not None:
+        received.append(int(msg[0]))
+    assert received == [11, 12, 13, 99]
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [
+        pytest.param(lambda a: a[::2], id="strided"),
+        pytest.param(lambda a: a[::-1], id="reversed"),
+        pytest.param(lambda a: a.view(np.int8), id="wrong-dtype"),
+    ],
+)
+def test_rejects_non_contiguous_buffers(queue: SMQueue, bad: Callable[[np.ndarray], np.ndarray]) -> None:
+    """Array arguments must be contiguous uint8 buffers; nothing is converted behind the caller's back."""
+    payload = bad(np.zeros(2 * PAYLOAD_SIZE, dtype=np.uint8))[:PAYLOAD_SIZE]
+    with pytest.raises(TypeError):
+        queue.push_with_header(payload, 0, 0)
+
+    assert queue.push(message(1))
+    dst = bad(np.zeros(2 * ELEMENT_SIZE, dtype=np.uint8))[:ELEMENT_SIZE]
+    with pytest.raises(TypeError):
+        queue.try_pop_into(dst)
+    with pytest.raises(TypeError):
+        queue.pop_blocking(dst, 0)
+    with pytest.raises(TypeError):
+        queue.try_pop_header_into(dst[: _HDR.size])
+
+    # The rejected calls left the message in place
+    out = np.zeros(ELEMENT_SIZE, dtype=np.uint8)
+    assert queue.try_pop_into(out)
+    assert out[0] == 1